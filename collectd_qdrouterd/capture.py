@@ -0,0 +1,121 @@
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Records management requests and responses, and replays them in place of
+a router
+"""
+
+import gzip
+import json
+import time
+import zlib
+
+import proton
+from proton import Url
+
+def _request_key(properties, body):
+    names = (body or {}).get(u'attributeNames') or []
+    return (properties.get(u'operation'), properties.get(u'entityType'),
+            tuple(names))
+
+class Recorder(object):
+    """
+    Appends each management request, its response body and the time it
+    took to a gzip compressed capture, one JSON object per line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def record(self, request, response, elapsed):
+        if self.file is None:
+            self.file = gzip.open(self.path, 'ab')
+        operation, entity_type, names = _request_key(request.properties,
+                                                     request.body)
+        entry = {'time': time.time(),
+                 'elapsed': elapsed,
+                 'operation': operation,
+                 'entityType': entity_type,
+                 'attributeNames': list(names),
+                 'response': response.body}
+        line = json.dumps(entry, default=str, separators=(',', ':'))
+        self.file.write((line + '\n').encode('utf-8'))
+        # Keep the capture readable if collectd is killed
+        self.file.flush(zlib.Z_SYNC_FLUSH)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class ReplayTransport(object):
+    """
+    Answers management requests from a capture, in place of the
+    SyncRequestResponse of a QdrouterdClient.
+
+    Requests are matched on operation, entity type and attribute names,
+    falling back to any recorded request for the entity type. The
+    responses recorded for a request are returned in turn, starting over
+    once exhausted. Each call takes the recorded time divided by speed, or
+    no time when speed is 0.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.url = Url('amqp://replay')
+        self.url.path = u'$management'
+        self.connection = self
+        self.speed = speed
+        self.responses = {}
+        self.positions = {}
+        for entry in self._entries(path):
+            key = (entry['operation'], entry['entityType'],
+                   tuple(entry['attributeNames']))
+            self.responses.setdefault(key, list()).append(entry)
+            self.responses.setdefault(key[:2], list()).append(entry)
+
+    @staticmethod
+    def _entries(path):
+        capture = gzip.open(path, 'rb')
+        try:
+            while True:
+                try:
+                    line = capture.readline()
+                except (EOFError, IOError):
+                    # Capture cut short while recording
+                    break
+                if not line:
+                    break
+                yield json.loads(line.decode('utf-8'))
+        finally:
+            capture.close()
+
+    def call(self, request):
+        key = _request_key(request.properties, request.body)
+        if key not in self.responses:
+            key = key[:2]
+        entries = self.responses.get(key)
+        if not entries:
+            raise KeyError('no %s of %s in capture' % key[:2])
+        position = self.positions.get(key, 0)
+        self.positions[key] = position + 1
+        entry = entries[position % len(entries)]
+        if self.speed:
+            time.sleep(entry['elapsed'] / self.speed)
+        return proton.Message(body=entry['response'])
+
+    def close(self):
+        pass
@@ -0,0 +1,101 @@
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Bounds the number of distinct plugin instances dispatched per router
+"""
+
+OVERFLOW_INSTANCE = '_overflow'
+
+class CardinalityGuard(object):
+    """
+    Admits entities into their own series up to a per category limit and
+    a limit for the router as a whole.
+
+    Admission is least recently used: an admitted entity keeps its series
+    for as long as it is seen every read cycle, and only entities that
+    missed a whole cycle are evicted to make room for new ones. Entities
+    that cannot be admitted are counted as dropped for the cycle.
+    """
+
+    def __init__(self, limits=None, total=None):
+        self.limits = dict(limits or {})
+        self.total = total
+        self.cycle = 0
+        self.admitted = {}
+        self.dropped = {}
+        self._stale = {}
+
+    def enabled(self, category):
+        return bool(self.total or self.limits.get(category))
+
+    def start_cycle(self):
+        """
+        Begin a new read cycle, resetting the dropped counts.
+        """
+        self.cycle += 1
+        self.dropped = {}
+        self._stale = {}
+
+    def admit(self, category, name):
+        """
+        Return True if the entity gets its own series, False if it
+        belongs in the overflow instance. Categories without a limit are
+        not tracked.
+        """
+        if not self.enabled(category):
+            return True
+        entries = self.admitted.setdefault(category, {})
+        if name in entries:
+            entries[name] = self.cycle
+            return True
+        limit = self.limits.get(category)
+        if limit and len(entries) >= limit and not self._evict(category):
+            return self._drop(category)
+        if self.total and self._count() >= self.total:
+            if not self._evict(category) and not self._evict_any():
+                return self._drop(category)
+        entries[name] = self.cycle
+        return True
+
+    def _drop(self, category):
+        self.dropped[category] = self.dropped.get(category, 0) + 1
+        return False
+
+    def _count(self):
+        return sum(len(entries) for entries in self.admitted.values())
+
+    def _evict_any(self):
+        for category in self.admitted:
+            if self._evict(category):
+                return True
+        return False
+
+    def _evict(self, category):
+        """
+        Evict the least recently seen entity that missed the last cycle.
+        """
+        entries = self.admitted.get(category, {})
+        idle = self.cycle - 1
+        stale = self._stale.get(category)
+        if stale is None:
+            stale = [name for name, seen in entries.items() if seen < idle]
+            stale.sort(key=lambda name: entries[name], reverse=True)
+            self._stale[category] = stale
+        while stale:
+            name = stale.pop()
+            if entries.get(name, idle) < idle:
+                del entries[name]
+                return True
+        return False
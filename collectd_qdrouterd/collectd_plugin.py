@@ -17,31 +17,171 @@ This module retrieves qdrouterd metrics to provide to collectd
 """
 
 import collectd
+import os
 import re
+import time
+import traceback
 
-from collectd_qdrouterd.qdrouterd import QdrouterdClient
+from collectd_qdrouterd.capture import Recorder, ReplayTransport
+from collectd_qdrouterd.cardinality import CardinalityGuard, OVERFLOW_INSTANCE
+from collectd_qdrouterd import config_file
+from collectd_qdrouterd.memory import MemoryTracker
+from collectd_qdrouterd.profiler import ReadProfiler
+from collectd_qdrouterd.qdrouterd import (CONNECTION_ERRORS, QdrouterdClient,
+                                          Sasl, ssl_domain)
+from collectd_qdrouterd.shard import ShardPool
+from collectd_qdrouterd.summary import RateTracker, column, summarize
 
-CONFIGS = []
-INSTANCES = []
+CONFIGS = {}
+INSTANCES = {}
+CONFIG_FILE = None
+CONFIG_MTIME = None
+SUMMARY_INSTANCE = '_summary'
+PROFILER = None
+WORKERS = 0
+SHARDS = None
+
+# Options of the plugin as a whole, only read from the plugin block
+PLUGIN_KEYS = ('ConfigFile', 'Workers', 'ProfileDir', 'ProfileCycles')
+
+# Attributes of each category that can be selected for dispatch
+KNOWN_STATS = {
+    'router': frozenset((
+        'linkRouteCount', 'autoLinkCount', 'linkCount', 'nodeCount',
+        'addrCount', 'connectionCount', 'presettledDeliveries',
+        'droppedPresettledDeliveries', 'acceptedDeliveries',
+        'rejectedDeliveries', 'releasedDeliveries', 'modifiedDeliveries',
+        'deliveriesIngress', 'deliveriesEgress', 'deliveriesTransit',
+        'deliveriesIngressRouteContainer', 'deliveriesEgressRouteContainer',
+        'deliveriesDelayed1Sec', 'deliveriesDelayed10Sec', 'deliveriesStuck',
+        'deliveriesRedirectedToFallback', 'linksBlocked')),
+    'link': frozenset((
+        'capacity', 'undeliveredCount', 'unsettledCount', 'deliveryCount',
+        'presettledCount', 'droppedPresettledCount', 'acceptedCount',
+        'rejectedCount', 'releasedCount', 'modifiedCount',
+        'deliveriesDelayed1Sec', 'deliveriesDelayed10Sec', 'deliveriesStuck',
+        'creditAvailable', 'zeroCreditSeconds', 'settleRate')),
+    'address': frozenset((
+        'inProcess', 'subscriberCount', 'remoteCount', 'containerCount',
+        'deliveriesIngress', 'deliveriesEgress', 'deliveriesTransit',
+        'deliveriesToContainer', 'deliveriesFromContainer',
+        'deliveriesRedirectedToFallback')),
+    'memory': frozenset((
+        'typeSize', 'transferBatchSize', 'localFreeListMax',
+        'globalFreeListMax', 'totalAllocFromHeap', 'totalFreeToHeap',
+        'heldByThreads', 'batchesRebalancedToThreads',
+        'batchesRebalancedToGlobal')),
+}
+
+SSL_KEYS = {
+    'SslTrustedCa': 'trusted_ca',
+    'SslCertificate': 'certificate',
+    'SslKey': 'key',
+    'SslKeyPassword': 'password',
+    'SslVerifyHostname': 'verify_hostname',
+}
+
+STATS_KEYS = {
+    'RouterStats': 'router',
+    'LinkStats': 'link',
+    'AddressStats': 'address',
+    'MemoryStats': 'memory',
+}
 
 def configure(config_values):
     """
     Converts a collectd configuration into qdrouterd configuration.
     """
 
+    global PROFILER, WORKERS, CONFIG_FILE
+
     collectd.debug('Configuring Qdrouterd Plugin')
+    profile_dir = None
+    profile_cycles = 10
+    reload_file = None
+    router_keys = False
+    for config_value in config_values.children:
+        if config_value.key == 'ConfigFile':
+            reload_file = CONFIG_FILE = config_value.values[0]
+        elif config_value.key == 'Workers':
+            WORKERS = int(config_value.values[0])
+        elif config_value.key == 'ProfileDir':
+            profile_dir = config_value.values[0]
+        elif config_value.key == 'ProfileCycles':
+            profile_cycles = int(config_value.values[0])
+        else:
+            router_keys = True
+
+    if profile_dir:
+        PROFILER = ReadProfiler(profile_dir, profile_cycles)
+    # A block that names a configuration file is a router only if it
+    # sets router options, on localhost unless Host is given
+    if reload_file and not router_keys:
+        return
+
+    config = parse_config(config_values)
+    if config:
+        apply_config(config)
+
+
+def parse_config(config_values, source=None):
+    """
+    Returns the qdrouterd configuration of a router block, or None when
+    it is invalid. The options of the plugin as a whole are ignored, with
+    a warning when the block was read from a source file.
+    """
+    name = None
+    host = None
+    port = '5672'
+    router = False
+    links = True
+    addr = False
+    mem = False
+    username = None
+    password = None
+    sasl_mechs = None
+    ssl = dict()
     link_include = list()
     addr_include = list()
+    link_limit = None
+    addr_limit = None
+    instance_limit = None
+    connection_limit = None
+    auto_links = False
+    link_routes = False
+    connections = False
+    stats = dict()
+    link_summary = False
+    addr_summary = False
+    mem_analysis = False
+    mem_window = 10
+    mem_top = 5
+    record = None
+    replay = None
+    replay_speed = 1.0
 
     for config_value  in config_values.children:
-        if config_value.key == 'Host':
+        if config_value.key == 'Name':
+            name = config_value.values[0]
+        elif config_value.key in PLUGIN_KEYS:
+            if source:
+                collectd.warning('qdrouterd plugin: %s is ignored in %s'
+                                 % (config_value.key, source))
+        elif config_value.key == 'Host':
             host = config_value.values[0]
         elif config_value.key == 'Port':
             port = config_value.values[0]
+            # Unquoted numbers are read as floats
+            if isinstance(port, (int, float)):
+                port = str(int(port))
         elif config_value.key == 'Username':
             username = config_value.values[0]
         elif config_value.key == 'Password':
             password = config_value.values[0]
+        elif config_value.key == 'SaslMechanisms':
+            sasl_mechs = config_value.values[0]
+        elif config_value.key in SSL_KEYS:
+            ssl[SSL_KEYS[config_value.key]] = config_value.values[0]
         elif config_value.key == 'Router':
             router = config_value.values[0]
         elif config_value.key == 'Links':
@@ -50,45 +190,252 @@ def configure(config_values):
             addr = config_value.values[0]
         elif config_value.key == 'Memory':
             mem = config_value.values[0]
+        elif config_value.key == 'AutoLinks':
+            auto_links = config_value.values[0]
+        elif config_value.key == 'LinkRoutes':
+            link_routes = config_value.values[0]
+        elif config_value.key == 'Connections':
+            connections = config_value.values[0]
         elif config_value.key == 'LinkInclude':
             for pattern in config_value.children:
                 link_include.append(pattern.values[0])
         elif config_value.key == 'AddressInclude':
             for pattern in config_value.children:
                 addr_include.append(pattern.values[0])
+        elif config_value.key == 'LinkSummary':
+            link_summary = config_value.values[0]
+        elif config_value.key == 'AddressSummary':
+            addr_summary = config_value.values[0]
+        elif config_value.key == 'MemoryAnalysis':
+            mem_analysis = config_value.values[0]
+        elif config_value.key == 'MemoryWindow':
+            value = int(config_value.values[0])
+            if value < 2:
+                collectd.error('qdrouterd plugin: MemoryWindow must be at least 2: %d'
+                               % value)
+            else:
+                mem_window = value
+        elif config_value.key == 'MemoryTop':
+            value = int(config_value.values[0])
+            if value < 0:
+                collectd.error('qdrouterd plugin: MemoryTop must not be negative: %d'
+                               % value)
+            else:
+                mem_top = value
+        elif config_value.key in STATS_KEYS:
+            category = STATS_KEYS[config_value.key]
+            stats[category] = select_stats(category,
+                                           [stat.values[0] for stat in config_value.children])
+        elif config_value.key == 'Record':
+            record = config_value.values[0]
+        elif config_value.key == 'Replay':
+            replay = config_value.values[0]
+        elif config_value.key == 'ReplaySpeed':
+            replay_speed = float(config_value.values[0])
+        elif config_value.key == 'LinkLimit':
+            link_limit = int(config_value.values[0])
+        elif config_value.key == 'AddressLimit':
+            addr_limit = int(config_value.values[0])
+        elif config_value.key == 'InstanceLimit':
+            instance_limit = int(config_value.values[0])
+        elif config_value.key == 'ConnectionLimit':
+            connection_limit = int(config_value.values[0])
         else:
             collectd.warning('qdrouterd plugin: unknown config key: %s', config_value.key)
 
-    global CONFIGS
+    if ssl and not ssl.get('trusted_ca'):
+        collectd.error('qdrouterd plugin: SslTrustedCa is required to connect '
+                       'to %s with TLS' % (host or 'localhost'))
+        return None
 
-    config = QdrouterdConfig(host, port, username, password,
+    config = QdrouterdConfig(host or 'localhost', port, username, password,
                              router, links, addr, mem,
-                             link_include, addr_include)
-    CONFIGS.append(config)
+                             link_include, addr_include,
+                             link_limit, addr_limit, instance_limit,
+                             auto_links, link_routes, connections,
+                             stats, mem_analysis, mem_window, mem_top,
+                             ssl, sasl_mechs, record, replay, replay_speed,
+                             link_summary, addr_summary, name,
+                             connection_limit)
+    config.settings = _settings(config_values)
+    return config
+
+
+def _settings(config_values):
+    return tuple((child.key, tuple(child.values), _settings(child))
+                 for child in config_values.children)
+
+
+def apply_config(config, configs=CONFIGS, instances=INSTANCES):
+    """
+    Add or update the configuration of a router. An unchanged router is
+    left alone. A changed router keeps the state its changes do not
+    affect, and its connection unless the connection settings changed.
+    """
+    old = configs.get(config.identity)
+    if old is not None and old.settings == config.settings:
+        return old
+    configs[config.identity] = config
+    if old is None:
+        return config
+    collectd.info('qdrouterd plugin: reconfiguring %s' % config.identity)
+    config.adopt(old)
+    instance = instances.pop(config.identity, None)
+    if instance:
+        if config.same_connection(old):
+            instance.reconfigure(config)
+            instances[config.identity] = instance
+        else:
+            instance.close()
+    return config
+
+
+def remove_config(identity, configs=CONFIGS, instances=INSTANCES):
+    """
+    Remove a router, closing its connection.
+    """
+    config = configs.pop(identity, None)
+    instance = instances.pop(identity, None)
+    if instance:
+        instance.close()
+    if config and config.recorder:
+        config.recorder.close()
+
+
+def reload_config_file():
+    """
+    Apply the routers of the configuration file when it changed since the
+    last read. Routers that were loaded from it and are no longer in it
+    are removed.
+    """
+    global CONFIG_MTIME
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime
+    except OSError as ex:
+        collectd.error('qdrouterd plugin: cannot read %s: %s' % (CONFIG_FILE, ex))
+        return
+    if mtime == CONFIG_MTIME:
+        return
+    CONFIG_MTIME = mtime
+    collectd.info('qdrouterd plugin: loading %s' % CONFIG_FILE)
+    try:
+        root = config_file.load(CONFIG_FILE)
+        configs = [parse_config(block, CONFIG_FILE) for block in root.children
+                   if block.key == 'Router']
+    except Exception as ex:
+        collectd.error('qdrouterd plugin: cannot load %s: %s' % (CONFIG_FILE, ex))
+        return
+    loaded = set()
+    for config in configs:
+        if config is None:
+            continue
+        config.source = CONFIG_FILE
+        apply_config(config)
+        loaded.add(config.identity)
+    for identity, config in list(CONFIGS.items()):
+        if config.source == CONFIG_FILE and identity not in loaded:
+            collectd.info('qdrouterd plugin: removing %s' % identity)
+            remove_config(identity)
+    if SHARDS:
+        SHARDS.update(list(CONFIGS.values()))
+
+
+def select_stats(category, names):
+    """
+    Validate the stats selected for a category against the known attributes.
+    """
+    selected = list()
+    for name in names:
+        if name not in KNOWN_STATS[category]:
+            collectd.error('qdrouterd plugin: unknown %s stat: %s' % (category, name))
+        elif name not in selected:
+            selected.append(name)
+    return tuple(selected)
 
 
 def read():
     """
     Retrieve metrics and dispatch data.
     """
-    global INSTANCES
     collectd.debug('Reading data from qdrouterd and dispatching')
-    for config in CONFIGS:
-        INSTANCES.append(CollectdPlugin(config))
-    for instance in INSTANCES:
+    if PROFILER:
+        PROFILER.run(read_instances)
+    else:
+        read_instances()
+
+def read_instances():
+    """
+    Read every configured router, reusing the connection of previous reads.
+    """
+    global SHARDS
+    if CONFIG_FILE:
+        reload_config_file()
+    if WORKERS > 1:
+        if SHARDS is None:
+            SHARDS = ShardPool(WORKERS, read_router, apply_config, remove_config)
+            SHARDS.start(list(CONFIGS.values()))
+        SHARDS.read(CollectdPlugin.dispatch_values, collectd)
+        return
+    read_configs(CONFIGS, INSTANCES)
+
+def read_configs(configs, instances):
+    """
+    Read the given routers, reusing the connection of previous reads. A
+    router that cannot be read is logged and the others are still read.
+    """
+    for config in list(configs.values()):
+        try:
+            read_router(config, instances)
+        except Exception:
+            collectd.error('qdrouterd plugin: %s' % traceback.format_exc())
+
+
+def read_router(config, instances, dispatch=None):
+    """
+    Read a router, reusing the connection of previous reads. No heartbeats
+    are sent between reads, so the router may have closed a kept connection
+    as idle: the read is then retried once on a new connection. Samples go
+    to dispatch when given instead of collectd.
+    """
+    instance = instances.pop(config.identity, None)
+    if instance is not None:
+        if dispatch:
+            instance.dispatch_values = dispatch
         try:
             instance.read()
-        finally:
+        except CONNECTION_ERRORS as ex:
+            instance.close()
+            collectd.info('qdrouterd plugin: reconnecting to %s: %s'
+                          % (config.identity, ex))
+        except:
             instance.close()
-    INSTANCES= []
+            raise
+        else:
+            instances[config.identity] = instance
+            return
+    instance = CollectdPlugin(config)
+    if dispatch:
+        instance.dispatch_values = dispatch
+    try:
+        instance.read()
+    except:
+        instance.close()
+        raise
+    instances[config.identity] = instance
 
 def shutdown():
     """
     Terminate data connections.
     """
     collectd.debug('Shutting down connections to qdrouterd')
-    for instance in INSTANCES:
+    if SHARDS:
+        SHARDS.close()
+    for instance in INSTANCES.values():
         instance.close()
+    INSTANCES.clear()
+    for config in CONFIGS.values():
+        if config.recorder:
+            config.recorder.close()
 
 class QdrouterdConfig(object):
     """
@@ -97,15 +444,40 @@ class QdrouterdConfig(object):
 
     def __init__(self, host, port, username, password,
                  router, links, addr, mem,
-                 link_include=None, addr_include=None):
+                 link_include=None, addr_include=None,
+                 link_limit=None, addr_limit=None, instance_limit=None,
+                 auto_links=False, link_routes=False, connections=False,
+                 stats=None, mem_analysis=False, mem_window=10, mem_top=5,
+                 ssl=None, sasl_mechs=None,
+                 record=None, replay=None, replay_speed=1.0,
+                 link_summary=False, addr_summary=False, name=None,
+                 connection_limit=None):
+        self.identity = name or "%s:%s" % (host, port)
+        # The configuration block this was parsed from, to detect changes,
+        # and the configuration file it was loaded from
+        self.settings = None
+        self.source = None
         self.host = host
         self.port = port
         self.username = username
         self.password = password
+        self.ssl = dict(ssl or {})
+        self.sasl_mechs = sasl_mechs
+        self.replay = replay
+        self.replay_speed = replay_speed
+        self.recorder = Recorder(record) if record else None
         self.router = router
         self.links = links
         self.addr = addr
         self.mem = mem
+        self.auto_links = auto_links
+        self.link_routes = link_routes
+        self.connections = connections
+        self.stats = dict(stats or {})
+        self.mem_analysis = mem_analysis
+        self.link_summary = link_summary
+        self.addr_summary = addr_summary
+        self.rates = dict()
         self.link_include = list()
         self.addr_include = list()
         if link_include:
@@ -114,6 +486,49 @@ class QdrouterdConfig(object):
         if addr_include:
             for pattern in addr_include:
                 self.addr_include.append(re.compile(pattern))
+        self.guard = CardinalityGuard({'link': link_limit,
+                                       'address': addr_limit,
+                                       'connection': connection_limit},
+                                      instance_limit)
+        self.memory = MemoryTracker(mem_window, mem_top)
+
+    def same_connection(self, other):
+        return ((self.url(), self.username, self.password, self.ssl,
+                 self.sasl_mechs, self.replay, self.replay_speed) ==
+                (other.url(), other.username, other.password, other.ssl,
+                 other.sasl_mechs, other.replay, other.replay_speed))
+
+    def adopt(self, old):
+        """
+        Take over the runtime state of the previous configuration of the
+        same router that the changes do not affect.
+        """
+        if (self.guard.limits, self.guard.total) == (old.guard.limits, old.guard.total):
+            self.guard = old.guard
+        if (self.memory.window, self.memory.top) == (old.memory.window, old.memory.top):
+            self.memory = old.memory
+        self.rates = old.rates
+        if self.recorder and old.recorder and self.recorder.path == old.recorder.path:
+            self.recorder = old.recorder
+        elif old.recorder:
+            old.recorder.close()
+
+    def url(self):
+        scheme = "amqps://" if self.ssl else "amqp://"
+        return scheme + self.host + ":" + self.port
+
+    def ssl_domain(self):
+        """
+        The SSLDomain shared by routers with the same TLS settings.
+        """
+        if not self.ssl:
+            return None
+        return ssl_domain(**self.ssl)
+
+    def sasl(self):
+        if not self.username:
+            return None
+        return Sasl(self.username, self.password, self.sasl_mechs)
 
     def is_link_included(self, name):
         if len(self.link_include) > 0:
@@ -152,23 +567,52 @@ class CollectdPlugin(QdrouterdClient):
                     'modifiedDeliveries', 'deliveriesIngress',
                     'deliveriesEgress', 'deliveriesTransit',
                     'deliveriesIngressRouteContainer',
-                    'deliveriesEgressRouteContainer','id')
+                    'deliveriesEgressRouteContainer')
     link_stats = ('undeliveredCount', 'unsettledCount', 'deliveryCount',
                   'presettledCount', 'droppedPresettledCount', 'acceptedCount',
-                  'rejectedCount', 'releasedCount', 'modifiedCount', 'linkName')
+                  'rejectedCount', 'releasedCount', 'modifiedCount')
     addr_stats = ('inProcess', 'subscriberCount', 'remoteCount',
                   'containerCount', 'deliveriesIngress', 'deliveriesEgress',
                   'deliveriesTransit', 'deliveriesToContainer',
-                  'deliveriesFromContainer', 'name')
+                  'deliveriesFromContainer')
     mem_stats = ('localFreeListMax', 'totalAllocFromHeap', 'heldByThreads',
-                 'batchesRebalancedToThreads', 'batchesRebalancedToGlobal',
-                 'identity')
+                 'batchesRebalancedToThreads', 'batchesRebalancedToGlobal')
+    mem_analysis_stats = ('typeSize', 'totalAllocFromHeap', 'totalFreeToHeap')
+    # Link stats summed per connection and reported for auto links,
+    # both derived from the link query already made for dispatch_links
+    connection_stats = ('undeliveredCount', 'unsettledCount', 'deliveryCount')
+    # Stats summarized by their distribution, and counters summarized by
+    # the distribution of their rates
+    link_summary_stats = ('undeliveredCount', 'unsettledCount')
+    link_summary_rates = (('deliveryCount', 'delivery-rate'),)
+    addr_summary_stats = ()
+    addr_summary_rates = (('deliveriesIngress', 'ingress-rate'),
+                          ('deliveriesEgress', 'egress-rate'))
 
     def __init__(self,config):
+        self.reconfigure(config)
+        self.url = config.url()
+        self.queries = {}
+        self.responses = {}
+        if config.replay:
+            connection = ReplayTransport(config.replay, config.replay_speed)
+        else:
+            connection = QdrouterdClient.connection(self.url,
+                                                    ssl_domain=config.ssl_domain(),
+                                                    sasl=config.sasl())
+        super(CollectdPlugin, self).__init__(connection, config.recorder)
+
+
+    def reconfigure(self, config):
+        """
+        Use a new configuration of the same router, keeping the connection.
+        """
         self.config = config
-        self.url = "amqp://" + config.host + ":" + config.port
-        super(CollectdPlugin, self).__init__(
-            QdrouterdClient.connection(self.url))
+        self.recorder = config.recorder
+        self.router_stats = config.stats.get('router', CollectdPlugin.router_stats)
+        self.link_stats = config.stats.get('link', CollectdPlugin.link_stats)
+        self.addr_stats = config.stats.get('address', CollectdPlugin.addr_stats)
+        self.mem_stats = config.stats.get('memory', CollectdPlugin.mem_stats)
 
 
     def _addr_text(self, addr):
@@ -191,18 +635,71 @@ class CollectdPlugin(QdrouterdClient):
         return identity
 
 
+    def query_response(self, entity_type, attribute_names=None, limit=None):
+        """
+        Query entities once per read, sharing the response between the
+        categories derived from it.
+        """
+        key = (entity_type, tuple(attribute_names or ()), limit)
+        if key not in self.responses:
+            self.responses[key] = super(CollectdPlugin, self).query(
+                entity_type, attribute_names, count=limit)
+        return self.responses[key]
+
     def query(self, entity_type, attribute_names=None, limit=None):
-        return super(CollectdPlugin, self).query(entity_type, attribute_names, count=limit).get_entities()
+        """
+        The entities of the shared query response, decoded once per read.
+        """
+        key = (entity_type, tuple(attribute_names or ()), limit)
+        if key not in self.queries:
+            self.queries[key] = self.query_response(
+                entity_type, attribute_names, limit).get_entities()
+        return self.queries[key]
+
+
+    def _link_attributes(self):
+        """
+        Attributes projected by the link query, shared by every category
+        derived from it.
+        """
+        names = ['linkName']
+        if self.config.links and self.config.link_summary:
+            # Link names are not unique, rates are keyed by identity
+            names.append('identity')
+            names.extend(self.link_summary_stats)
+            names.extend(stat_name for stat_name, _ in self.link_summary_rates)
+        elif self.config.links:
+            names.extend(self.link_stats)
+        if self.config.connections:
+            names.append('connectionId')
+        if self.config.auto_links:
+            names.append('identity')
+        if self.config.connections or self.config.auto_links:
+            names.extend(self.connection_stats)
+        attributes = list()
+        for name in names:
+            if name not in attributes:
+                attributes.append(name)
+        return tuple(attributes)
 
 
     def read(self):
         """
         Dispatches metric values to collectd.
         """
+        self.queries = {}
+        self.responses = {}
+        self.config.guard.start_cycle()
         if self.config.router:
             self.dispatch_router()
         if self.config.links:
             self.dispatch_links()
+        if self.config.connections:
+            self.dispatch_connections()
+        if self.config.auto_links:
+            self.dispatch_auto_links()
+        if self.config.link_routes:
+            self.dispatch_link_routes()
         if self.config.addr:
             self.dispatch_addresses()
         if self.config.mem:
@@ -215,44 +712,176 @@ class CollectdPlugin(QdrouterdClient):
         """
         collectd.debug('Dispatching general router data')
 
-        objects = self.query('org.apache.qpid.dispatch.router')
+        objects = self.query('org.apache.qpid.dispatch.router',
+                             ('id',) + self.router_stats)
 
         router = objects[0]
         for stat_name in self.router_stats:
-            if stat_name != 'id':
+            try:
+                value = str(getattr(router, stat_name))
+                self.dispatch_values(value,
+                                     self.config.host,
+                                     'router',
+                                     router.id,
+                                     uncamelcase(stat_name))
+            except:
+                pass
+
+
+    def dispatch_links(self):
+        """
+        Dispatch link data
+        """
+        collectd.debug('Dispatching link data')
+
+        if self.config.link_summary:
+            response = self.query_response('org.apache.qpid.dispatch.router.link',
+                                           self._link_attributes())
+            rows = response.results
+            if self.config.link_include:
+                name = response.attribute_names.index('linkName')
+                rows = [row for row in rows
+                        if self.config.is_link_included(row[name])]
+            self.dispatch_summary('link', response.attribute_names, rows,
+                                  'identity',
+                                  self.link_summary_stats,
+                                  self.link_summary_rates)
+            return
+
+        objects = self.query('org.apache.qpid.dispatch.router.link',
+                             self._link_attributes())
+
+        overflow = {}
+        for link in objects:
+            if not self.config.is_link_included(link.linkName):
+                continue
+            if not self.config.guard.admit('link', link.linkName):
+                self._accumulate(overflow, link, self.link_stats)
+                continue
+            for stat_name in self.link_stats:
                 try:
-                    value = str(getattr(router, stat_name))
+                    value = str(getattr(link, stat_name))
                     self.dispatch_values(value,
                                          self.config.host,
-                                         'router',
-                                         router.id,
+                                         'link',
+                                         link.linkName,
                                          uncamelcase(stat_name))
                 except:
                     pass
+        self.dispatch_overflow('link', overflow)
 
 
-    def dispatch_links(self):
+    def dispatch_connections(self):
         """
-        Dispatch link data
+        Dispatch link data summed per connection
         """
-        collectd.debug('Dispatching link data')
+        collectd.debug('Dispatching connection data')
 
-        objects = self.query('org.apache.qpid.dispatch.router.link')
+        objects = self.query('org.apache.qpid.dispatch.router.link',
+                             self._link_attributes())
 
+        totals = {}
+        dropped = set()
+        overflow = {'linkCount': 0}
         for link in objects:
-            if not self.config.is_link_included(link.linkName):
+            try:
+                conn_id = link.connectionId
+            except KeyError:
                 continue
-            for stat_name in self.link_stats:
-                if stat_name != 'linkName':
-                    try:
-                        value = str(getattr(link, stat_name))
-                        self.dispatch_values(value,
-                                             self.config.host,
-                                             'link',
-                                             link.linkName,
-                                             uncamelcase(stat_name))
-                    except:
-                        pass
+            if conn_id is None or not self.config.is_link_included(link.linkName):
+                continue
+            conn = totals.get(conn_id)
+            if conn is None:
+                # Each connection is admitted or dropped once per cycle
+                if conn_id in dropped or \
+                   not self.config.guard.admit('connection', str(conn_id)):
+                    dropped.add(conn_id)
+                    overflow['linkCount'] += 1
+                    self._accumulate(overflow, link, self.connection_stats)
+                    continue
+                conn = totals[conn_id] = {'linkCount': 0}
+            conn['linkCount'] += 1
+            self._accumulate(conn, link, self.connection_stats)
+
+        for conn_id, conn in totals.items():
+            for stat_name, value in conn.items():
+                self.dispatch_values(str(value),
+                                     self.config.host,
+                                     'connection',
+                                     str(conn_id),
+                                     uncamelcase(stat_name))
+        self.dispatch_overflow('connection', overflow)
+
+
+    def dispatch_auto_links(self):
+        """
+        Dispatch auto link status and the stats of the link it attached
+        """
+        collectd.debug('Dispatching auto link data')
+
+        objects = self.query('org.apache.qpid.dispatch.router.config.autoLink')
+        if not objects:
+            return
+        links = dict()
+        for link in self.query('org.apache.qpid.dispatch.router.link',
+                               self._link_attributes()):
+            if 'identity' in link:
+                links[link.identity] = link
+
+        for auto_link in objects:
+            instance = self._config_name(auto_link, 'addr', 'address')
+            self.dispatch_values(self._oper_status(auto_link),
+                                 self.config.host,
+                                 'autolink',
+                                 instance,
+                                 'oper-status')
+            link = links.get(auto_link['linkRef'] if 'linkRef' in auto_link else None)
+            if link is None:
+                continue
+            for stat_name in self.connection_stats:
+                try:
+                    value = str(getattr(link, stat_name))
+                    self.dispatch_values(value,
+                                         self.config.host,
+                                         'autolink',
+                                         instance,
+                                         uncamelcase(stat_name))
+                except:
+                    pass
+
+
+    def dispatch_link_routes(self):
+        """
+        Dispatch link route status
+        """
+        collectd.debug('Dispatching link route data')
+
+        objects = self.query('org.apache.qpid.dispatch.router.config.linkRoute')
+
+        for link_route in objects:
+            self.dispatch_values(self._oper_status(link_route),
+                                 self.config.host,
+                                 'linkroute',
+                                 self._config_name(link_route, 'prefix', 'pattern'),
+                                 'oper-status')
+
+
+    @staticmethod
+    def _config_name(entity, *alternates):
+        """
+        Name of a configured entity, falling back to its address
+        """
+        for attr in ('name',) + alternates:
+            if attr in entity and entity[attr]:
+                return entity[attr]
+        return entity['identity'] if 'identity' in entity else '-'
+
+
+    @staticmethod
+    def _oper_status(entity):
+        if 'operStatus' in entity and entity['operStatus'] == 'active':
+            return '1'
+        return '0'
 
 
     def dispatch_addresses(self):
@@ -261,22 +890,46 @@ class CollectdPlugin(QdrouterdClient):
         """
         collectd.debug('Dispatching address data')
 
-        objects = self.query('org.apache.qpid.dispatch.router.address')
+        if self.config.addr_summary:
+            attributes = self.addr_summary_stats + tuple(
+                stat_name for stat_name, _ in self.addr_summary_rates)
+        else:
+            attributes = self.addr_stats
+        if self.config.addr_summary:
+            response = self.query_response('org.apache.qpid.dispatch.router.address',
+                                           ('name',) + attributes)
+            rows = response.results
+            if self.config.addr_include:
+                name = response.attribute_names.index('name')
+                rows = [row for row in rows
+                        if self.config.is_addr_included(row[name])]
+            self.dispatch_summary('address', response.attribute_names, rows,
+                                  'name',
+                                  self.addr_summary_stats,
+                                  self.addr_summary_rates)
+            return
+
+        objects = self.query('org.apache.qpid.dispatch.router.address',
+                             ('name',) + attributes)
 
+        overflow = {}
         for addr in objects:
             if not self.config.is_addr_included(addr.name):
                 continue
+            if not self.config.guard.admit('address', addr.name):
+                self._accumulate(overflow, addr, self.addr_stats)
+                continue
             for stat_name in self.addr_stats:
-                if stat_name != 'name':
-                    try:
-                        value = str(getattr(addr, stat_name))
-                        self.dispatch_values(value,
-                                             self.config.host,
-                                             'address',
-                                             self._addr_text(addr.name),
-                                             uncamelcase(stat_name))
-                    except:
-                        pass
+                try:
+                    value = str(getattr(addr, stat_name))
+                    self.dispatch_values(value,
+                                         self.config.host,
+                                         'address',
+                                         self._addr_text(addr.name),
+                                         uncamelcase(stat_name))
+                except:
+                    pass
+        self.dispatch_overflow('address', overflow)
 
 
     def dispatch_memory(self):
@@ -285,21 +938,127 @@ class CollectdPlugin(QdrouterdClient):
         """
         collectd.debug('Dispatching memory data')
 
-        objects = self.query('org.apache.qpid.dispatch.allocator')
+        if self.config.mem_analysis:
+            self.dispatch_memory_analysis()
+            return
+
+        objects = self.query('org.apache.qpid.dispatch.allocator',
+                             ('identity',) + self.mem_stats)
 
         for mem in objects:
             for stat_name in self.mem_stats:
-                if stat_name != 'identity':
-                    try:
-                        value = str(getattr(mem, stat_name))
-                        self.dispatch_values(value,
-                                             self.config.host,
-                                             'memory',
-                                             mem.identity,
-                                             uncamelcase(stat_name))
-                    except:
-                        pass
+                try:
+                    value = str(getattr(mem, stat_name))
+                    self.dispatch_values(value,
+                                         self.config.host,
+                                         'memory',
+                                         mem.identity,
+                                         uncamelcase(stat_name))
+                except:
+                    pass
+
 
+    def dispatch_memory_analysis(self):
+        """
+        Dispatch the memory held in total and by the top growing types
+        """
+        objects = self.query('org.apache.qpid.dispatch.allocator',
+                             ('identity',) + self.mem_analysis_stats)
+
+        held = dict()
+        for mem in objects:
+            try:
+                held[mem.identity] = MemoryTracker.held_bytes(
+                    mem.typeSize, mem.totalAllocFromHeap,
+                    mem['totalFreeToHeap'] if 'totalFreeToHeap' in mem else None)
+            except (KeyError, TypeError):
+                pass
+        self.config.memory.update(time.time(), held)
+
+        total, growth, suspects, types = self.config.memory.analyze()
+        for metric_type, value in (('memory-bytes', total),
+                                   ('memory-growth', growth),
+                                   ('leak-suspects', suspects)):
+            self.dispatch_values(str(value),
+                                 self.config.host,
+                                 'memory',
+                                 '_total',
+                                 metric_type)
+        for name, value, slope, suspect in types:
+            for metric_type, value in (('memory-bytes', value),
+                                       ('memory-growth', slope),
+                                       ('leak-suspect', int(suspect))):
+                self.dispatch_values(str(value),
+                                     self.config.host,
+                                     'memory',
+                                     name,
+                                     metric_type)
+
+
+    def dispatch_summary(self, plugin, names, rows, key, stats, rates):
+        """
+        Dispatch the distribution of stats and counter rates over the rows
+        of a query response, instead of a series per entity. The columns
+        are read from the rows without decoding them into entities.
+        """
+        index = dict((name, n) for n, name in enumerate(names))
+        for stat_name in stats:
+            self._dispatch_summary(plugin, uncamelcase(stat_name),
+                                   summarize(column(rows, index.get(stat_name))))
+        if not rates:
+            return
+        now = time.time()
+        keys = [row[index[key]] for row in rows]
+        for stat_name, metric_type in rates:
+            tracker = self.config.rates.get((plugin, stat_name))
+            if tracker is None:
+                tracker = self.config.rates[(plugin, stat_name)] = RateTracker()
+            values = tracker.rates(now, keys, column(rows, index.get(stat_name)))
+            self._dispatch_summary(plugin, metric_type, summarize(values))
+
+
+    def _dispatch_summary(self, plugin, metric_type, summary):
+        for name, value in summary:
+            self.dispatch_values(str(value),
+                                 self.config.host,
+                                 plugin,
+                                 SUMMARY_INSTANCE,
+                                 metric_type,
+                                 name)
+
+
+    @staticmethod
+    def _accumulate(totals, entity, stats):
+        """
+        Add the stats of an entity to the totals.
+        """
+        for stat_name in stats:
+            try:
+                value = getattr(entity, stat_name)
+            except KeyError:
+                continue
+            if value is not None:
+                totals[stat_name] = totals.get(stat_name, 0) + value
+
+
+    def dispatch_overflow(self, plugin, totals):
+        """
+        Dispatch the summed stats of the entities beyond the limits and
+        the number of entities dropped this cycle
+        """
+        if not self.config.guard.enabled(plugin):
+            return
+        for stat_name, value in totals.items():
+            self.dispatch_values(str(value),
+                                 self.config.host,
+                                 plugin,
+                                 OVERFLOW_INSTANCE,
+                                 uncamelcase(stat_name))
+        self.dispatch_values(str(self.config.guard.dropped.get(plugin, 0)),
+                             self.config.host,
+                             plugin,
+                             OVERFLOW_INSTANCE,
+                             'dropped-instances')
 
 
     @staticmethod
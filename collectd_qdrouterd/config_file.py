@@ -0,0 +1,95 @@
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Reads router configurations written in collectd's configuration syntax
+"""
+
+import re
+
+TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|([^\s"]+)')
+ESCAPE_RE = re.compile(r'\\(.)')
+
+class ConfigNode(object):
+    """
+    A configuration key with its values and children, like the
+    collectd.Config objects passed to the configure callback.
+    """
+
+    def __init__(self, key, values=None, children=None):
+        self.key = key
+        self.values = list(values or ())
+        self.children = list(children or ())
+
+    def __repr__(self):
+        return "ConfigNode(%r, %r, %r)" % (self.key, self.values, self.children)
+
+
+def _value(token, quoted):
+    if quoted is not None:
+        return ESCAPE_RE.sub(r'\1', quoted)
+    lower = token.lower()
+    if lower == 'true':
+        return True
+    if lower == 'false':
+        return False
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+def _tokens(line):
+    values = list()
+    for match in TOKEN_RE.finditer(line):
+        quoted, token = match.groups()
+        if token is not None and token.startswith('#'):
+            break
+        values.append(_value(token, quoted))
+    return values
+
+
+def parse(lines):
+    """
+    Parse configuration lines into a root ConfigNode.
+    """
+    root = ConfigNode('root')
+    stack = [root]
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('</'):
+            key = line[2:].rstrip('>').strip()
+            if len(stack) == 1 or stack[-1].key != key:
+                raise ValueError('line %d: unexpected </%s>' % (number, key))
+            stack.pop()
+        elif line.startswith('<'):
+            if not line.endswith('>'):
+                raise ValueError('line %d: unterminated <%s' % (number, line[1:]))
+            tokens = _tokens(line[1:-1])
+            node = ConfigNode(tokens[0], tokens[1:])
+            stack[-1].children.append(node)
+            stack.append(node)
+        else:
+            tokens = _tokens(line)
+            stack[-1].children.append(ConfigNode(tokens[0], tokens[1:]))
+    if len(stack) > 1:
+        raise ValueError('missing </%s>' % stack[-1].key)
+    return root
+
+
+def load(path):
+    with open(path) as config_file:
+        return parse(config_file)
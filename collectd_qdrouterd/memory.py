@@ -0,0 +1,101 @@
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Tracks the memory held per allocator type to detect leak trends
+"""
+
+from collections import deque
+
+class MemoryTracker(object):
+    """
+    Keeps a sliding window of the bytes held by each allocator type and
+    computes their growth in bytes per second.
+
+    A type is a leak suspect when its window is full, it never shrank
+    within the window and it grew overall.
+    """
+
+    def __init__(self, window=10, top=5):
+        self.window = window
+        self.top = top
+        self.samples = {}
+
+    @staticmethod
+    def held_bytes(type_size, allocated, freed=None):
+        """
+        Bytes held by an allocator type from its size and count fields.
+        """
+        return type_size * (allocated - (freed or 0))
+
+    def update(self, now, held):
+        """
+        Record the bytes held by each type at time now. Types no longer
+        reported are forgotten.
+        """
+        for name in list(self.samples):
+            if name not in held:
+                del self.samples[name]
+        for name, value in held.items():
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append((now, value))
+
+    @staticmethod
+    def slope(samples):
+        """
+        Least squares slope of the samples, in bytes per second.
+        """
+        count = len(samples)
+        if count < 2:
+            return 0.0
+        mean_t = sum(t for t, _ in samples) / float(count)
+        mean_v = sum(v for _, v in samples) / float(count)
+        num = sum((t - mean_t) * (v - mean_v) for t, v in samples)
+        den = sum((t - mean_t) ** 2 for t, _ in samples)
+        if not den:
+            return 0.0
+        return num / den
+
+    def is_suspect(self, samples, slope):
+        if len(samples) < self.window or slope <= 0:
+            return False
+        values = [v for _, v in samples]
+        for prev, value in zip(values, values[1:]):
+            if value < prev:
+                return False
+        return True
+
+    def analyze(self):
+        """
+        Return the total bytes held, the total growth, the number of leak
+        suspects and (name, bytes, growth, suspect) for the top growing
+        types.
+        """
+        total = 0
+        growth = 0.0
+        suspects = 0
+        types = list()
+        for name, samples in self.samples.items():
+            slope = self.slope(samples)
+            suspect = self.is_suspect(samples, slope)
+            total += samples[-1][1]
+            growth += slope
+            if suspect:
+                suspects += 1
+            if slope > 0:
+                types.append((name, samples[-1][1], slope, suspect))
+        types.sort(key=lambda entry: entry[2], reverse=True)
+        return total, growth, suspects, types[:self.top]
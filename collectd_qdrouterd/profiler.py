@@ -0,0 +1,148 @@
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Profiles read cycles of a live collector on request
+"""
+
+import cProfile
+import os
+import sys
+import threading
+import time
+
+FLAG_FILE = 'enable'
+
+# Seconds between samples of the stack of the thread being profiled
+SAMPLE_INTERVAL = 0.005
+
+class ReadProfiler(object):
+    """
+    Runs cProfile and a stack sampler around a number of read cycles once
+    requested, either by creating the flag file in the profile directory
+    or by calling request(). The aggregated profile is written to the
+    directory as a pstats file, and the sampled stacks as folded stacks
+    for flamegraph tools.
+
+    While no profile is requested the only cost is checking for the flag
+    file once per read.
+    """
+
+    def __init__(self, directory, cycles=10):
+        self.directory = directory
+        self.cycles = cycles
+        self.flag = os.path.join(directory, FLAG_FILE)
+        self.remaining = 0
+        self.profile = None
+        self.stacks = {}
+
+    def request(self):
+        """
+        Profile the next read cycles.
+        """
+        if not self.remaining:
+            self.remaining = self.cycles
+
+    def _flagged(self):
+        if not os.path.exists(self.flag):
+            return False
+        try:
+            os.remove(self.flag)
+        except OSError:
+            pass
+        return True
+
+    def run(self, func, *args):
+        """
+        Call func, profiling it if a profile is in progress.
+        """
+        if not self.remaining:
+            if not self._flagged():
+                return func(*args)
+            self.request()
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+        sampler = StackSampler(threading.current_thread().ident, self.stacks)
+        sampler.start()
+        self.profile.enable()
+        try:
+            return func(*args)
+        finally:
+            self.profile.disable()
+            sampler.stop()
+            self.remaining -= 1
+            if not self.remaining:
+                self.write()
+
+    def write(self):
+        """
+        Write the aggregated profile and start afresh.
+        """
+        profile, stacks = self.profile, self.stacks
+        self.profile, self.stacks = None, {}
+        if profile is None:
+            return
+        base = os.path.join(self.directory,
+                            time.strftime('read-%Y%m%d-%H%M%S'))
+        profile.dump_stats(base + '.pstats')
+        with open(base + '.folded', 'w') as folded:
+            write_folded(stacks, folded)
+
+
+def _label(code):
+    label = '%s:%s' % (os.path.basename(code.co_filename), code.co_name)
+    return label.replace(' ', '_').replace(';', ':')
+
+
+class StackSampler(threading.Thread):
+    """
+    Counts the full stacks of a thread, sampled every interval seconds
+    until stopped.
+    """
+
+    def __init__(self, thread_id, stacks, interval=SAMPLE_INTERVAL):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.thread_id = thread_id
+        self.stacks = stacks
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            time.sleep(self.interval)
+            self.sample()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        labels = list()
+        while frame is not None:
+            labels.append(_label(frame.f_code))
+            frame = frame.f_back
+        if labels:
+            stack = ';'.join(reversed(labels))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def write_folded(stacks, out):
+    """
+    Write the sampled stacks with their sample counts, in the folded
+    stacks format read by flamegraph tools.
+    """
+    for stack, count in sorted(stacks.items()):
+        out.write('%s %d\n' % (stack, count))
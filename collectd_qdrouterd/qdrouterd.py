@@ -19,12 +19,52 @@
 #
 
 import collectd
-import itertools, re
+import itertools, re, time
 
 import proton
 from proton import Message, Url, ConnectionException, Timeout, SSLDomain
 from proton.utils import SyncRequestResponse, BlockingConnection
 
+SSL_DOMAINS = {}
+
+# Errors raised by a connection that the router closed or that stopped
+# answering
+CONNECTION_ERRORS = (proton.ProtonException, IOError, OSError)
+
+def ssl_domain(trusted_ca=None, certificate=None, key=None, password=None,
+               verify_hostname=True):
+    """
+    Return the client SSLDomain for the given CA and certificate, shared
+    by every connection using the same settings. The router is always
+    verified, a domain without a CA fails to connect rather than accept
+    any peer.
+    """
+    settings = (trusted_ca, certificate, key, password, verify_hostname)
+    domain = SSL_DOMAINS.get(settings)
+    if domain is None:
+        domain = SSLDomain(SSLDomain.MODE_CLIENT)
+        if trusted_ca:
+            domain.set_trusted_ca_db(str(trusted_ca))
+        if verify_hostname:
+            domain.set_peer_authentication(SSLDomain.VERIFY_PEER_NAME)
+        else:
+            domain.set_peer_authentication(SSLDomain.VERIFY_PEER)
+        if certificate:
+            domain.set_credentials(str(certificate), str(key) if key else None,
+                                   str(password) if password else None)
+        SSL_DOMAINS[settings] = domain
+    return domain
+
+class Sasl(object):
+    """
+    SASL settings for a management connection.
+    """
+
+    def __init__(self, user=None, password=None, mechs=None):
+        self.user = user
+        self.password = password
+        self.mechs = mechs
+
 class Entity(object):
     """
     A collection of named attributes.
@@ -77,7 +117,7 @@ class QdrouterdClient(object):
                                   sasl_enabled=sasl_enabled,
                                   allowed_mechs=str(sasl.mechs) if sasl and sasl.mechs != None else None,
                                   user=str(sasl.user) if sasl else None,
-                                  password=str(sasl.password) if sasl else None)
+                                  password=str(sasl.password) if sasl and sasl.password != None else None)
 
     @staticmethod
     def connect(url=None, timeout=10, ssl_domain=None, sasl=None):
@@ -86,14 +126,19 @@ class QdrouterdClient(object):
         """
         return QdrouterdClient(QdrouterdClient.connection(url, timeout, ssl_domain, sasl))      
         
-    def __init__(self, connection):
+    def __init__(self, connection, recorder=None):
         """
-        Create a management client proxy using the given connection.
+        Create a management client proxy using the given connection, or
+        a transport answering calls itself such as a ReplayTransport.
         """
         self.name = self.identity = u'self'
         self.type = u'org.amqp.management' # AMQP management node type
         self.url = connection.url
-        self.client = SyncRequestResponse(connection, self.url.path)
+        if hasattr(connection, 'call'):
+            self.client = connection
+        else:
+            self.client = SyncRequestResponse(connection, self.url.path)
+        self.recorder = recorder
 
     def close(self):
         """
@@ -126,7 +171,11 @@ class QdrouterdClient(object):
         """
         Send a management request message, wait for a response.
         """
+        if not self.recorder:
+            return self.client.call(request)
+        start = time.time()
         response = self.client.call(request)
+        self.recorder.record(request, response, time.time() - start)
         return response
 
     class QueryResponse(object):
@@ -0,0 +1,307 @@
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Spreads the routers over worker processes that query and decode their
+stats, sending the samples back to collectd for dispatch
+"""
+
+import multiprocessing
+import sys
+import traceback
+import zlib
+from array import array
+
+try:
+    MP = multiprocessing.get_context('fork')
+except AttributeError:
+    MP = multiprocessing
+
+def _tobytes(values):
+    try:
+        return values.tobytes()
+    except AttributeError:
+        return values.tostring()
+
+def _frombytes(values, data):
+    try:
+        values.frombytes(data)
+    except AttributeError:
+        values.fromstring(data)
+
+# Keys kept in the tables beyond those of the last cycle before a reset
+SPARE_KEYS = 1024
+
+class SampleBatch(object):
+    """
+    Samples of one read cycle packed as arrays of key indices and values.
+
+    Each distinct (host, plugin, plugin_instance, type, type_instance) key
+    is sent once, the first time it is seen, and by index afterwards. Once
+    the keys of entities that went away outnumber the live ones, the table
+    is reset and the next batch tells the receiver to reset its own.
+    """
+
+    def __init__(self, spare=SPARE_KEYS):
+        self.spare = spare
+        self.keys = {}
+        self.reset = False
+        self.clear()
+
+    def clear(self):
+        self.added = list()
+        self.indices = array('L')
+        self.values = array('d')
+
+    def add(self, values, host, plugin, plugin_instance,
+            metric_type, type_instance=None):
+        """
+        Record a sample, with the signature of CollectdPlugin.dispatch_values.
+        """
+        try:
+            value = float(values)
+        except (TypeError, ValueError):
+            return
+        key = (host, plugin, plugin_instance, metric_type, type_instance)
+        index = self.keys.get(key)
+        if index is None:
+            index = self.keys[key] = len(self.keys)
+            self.added.append(key)
+        self.indices.append(index)
+        self.values.append(value)
+
+    def pack(self):
+        packed = (self.reset, self.added,
+                  _tobytes(self.indices), _tobytes(self.values))
+        live = len(set(self.indices))
+        self.clear()
+        self.reset = len(self.keys) > 2 * live + self.spare
+        if self.reset:
+            self.keys = {}
+        return packed
+
+
+class SampleTable(object):
+    """
+    Parent side of a worker's batches, mapping indices back to keys.
+    """
+
+    def __init__(self):
+        self.keys = list()
+
+    def unpack(self, packed):
+        reset, added, index_data, value_data = packed
+        if reset:
+            self.keys = list()
+        self.keys.extend(added)
+        indices = array('L')
+        _frombytes(indices, index_data)
+        values = array('d')
+        _frombytes(values, value_data)
+        for index, value in zip(indices, values):
+            yield self.keys[index], value
+
+
+class LogBuffer(object):
+    """
+    Stands in for the collectd module in a worker, keeping the messages
+    logged for the parent to log with the next batch. Calling into
+    collectd from a forked process is not safe.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.messages = list()
+
+    def _log(self, level, message, *args):
+        self.messages.append((level, message % args if args else message))
+
+    def debug(self, message, *args):
+        self._log('debug', message, *args)
+
+    def info(self, message, *args):
+        self._log('info', message, *args)
+
+    def notice(self, message, *args):
+        self._log('notice', message, *args)
+
+    def warning(self, message, *args):
+        self._log('warning', message, *args)
+
+    def error(self, message, *args):
+        self._log('error', message, *args)
+
+    def drain(self):
+        messages = self.messages
+        self.messages = list()
+        return messages
+
+    def __getattr__(self, name):
+        return getattr(self.module, name)
+
+
+def _work(conn, configs, read_router, apply_config, remove_config):
+    """
+    Worker loop: read the routers of this shard on every request and send
+    back the packed samples and the messages logged. A list of
+    configurations replaces the routers of this shard, keeping the state
+    of unchanged ones.
+    """
+    module = sys.modules[read_router.__module__]
+    log = module.collectd = LogBuffer(module.collectd)
+    routers = {}
+    instances = {}
+    for config in configs:
+        routers[config.identity] = config
+    batch = SampleBatch()
+    try:
+        while True:
+            message = conn.recv()
+            if message is False:
+                break
+            if message is not True:
+                identities = set(config.identity for config in message)
+                for identity in list(routers):
+                    if identity not in identities:
+                        remove_config(identity, routers, instances)
+                for config in message:
+                    apply_config(config, routers, instances)
+                continue
+            for config in list(routers.values()):
+                try:
+                    read_router(config, instances, batch.add)
+                except Exception:
+                    log.error('qdrouterd plugin: %s' % traceback.format_exc())
+            conn.send((batch.pack(), log.drain()))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for instance in instances.values():
+            instance.close()
+
+
+class Shard(object):
+    """
+    A worker process and the routers it owns.
+    """
+
+    def __init__(self, configs, read_router, apply_config, remove_config):
+        self.configs = configs
+        self.table = SampleTable()
+        self.conn, child = MP.Pipe()
+        self.process = MP.Process(target=_work,
+                                  args=(child, configs, read_router,
+                                        apply_config, remove_config))
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+
+    def update(self, configs):
+        """
+        Send the worker its new routers if they changed.
+        """
+        if [(c.identity, c.settings) for c in configs] != \
+           [(c.identity, c.settings) for c in self.configs]:
+            self.configs = configs
+            self.conn.send(configs)
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def close(self):
+        try:
+            self.conn.send(False)
+        except (IOError, OSError):
+            pass
+        self.conn.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ShardPool(object):
+    """
+    Worker processes sharing the configured routers between them.
+    """
+
+    def __init__(self, workers, read_router, apply_config, remove_config):
+        self.workers = workers
+        self.hooks = (read_router, apply_config, remove_config)
+        self.shards = list()
+
+    def _assign(self, configs):
+        """
+        Split the routers between the workers by a hash of their identity,
+        so that adding or removing a router does not move the others.
+        """
+        assigned = [list() for n in range(self.workers)]
+        for config in sorted(configs, key=lambda config: config.identity):
+            shard = zlib.crc32(config.identity.encode('utf-8')) & 0xffffffff
+            assigned[shard % self.workers].append(config)
+        return assigned
+
+    def _restart(self, n):
+        shard = self.shards[n]
+        shard.close()
+        shard = self.shards[n] = Shard(shard.configs, *self.hooks)
+        return shard
+
+    def start(self, configs):
+        for assigned in self._assign(configs):
+            self.shards.append(Shard(assigned, *self.hooks))
+
+    def update(self, configs):
+        for shard, assigned in zip(self.shards, self._assign(configs)):
+            shard.update(assigned)
+
+    def read(self, dispatch, log):
+        """
+        Have every worker read its routers, then dispatch their samples and
+        log their messages with the log module given. Workers that died are
+        restarted for the next read, as are workers whose reply was not
+        received, so that a late reply is not taken for the next one.
+        """
+        pending = list()
+        for n, shard in enumerate(self.shards):
+            if not shard.alive():
+                shard = self._restart(n)
+            try:
+                shard.conn.send(True)
+            except (IOError, OSError):
+                log.error('qdrouterd plugin: worker %d exited' % shard.process.pid)
+                self._restart(n)
+                continue
+            pending.append(n)
+        try:
+            while pending:
+                n = pending.pop(0)
+                shard = self.shards[n]
+                try:
+                    packed, messages = shard.conn.recv()
+                except (EOFError, IOError, OSError):
+                    log.error('qdrouterd plugin: worker %d exited' % shard.process.pid)
+                    self._restart(n)
+                    continue
+                for level, message in messages:
+                    getattr(log, level)(message)
+                for key, value in shard.table.unpack(packed):
+                    dispatch(value, *key)
+        finally:
+            for n in pending:
+                self._restart(n)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self.shards = list()
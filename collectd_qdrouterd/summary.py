@@ -0,0 +1,114 @@
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Summarizes a column of entity stats as a fixed set of values, using NumPy
+when it is available
+"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PERCENTILES = ((50, 'p50'), (90, 'p90'), (99, 'p99'))
+
+# Bucket 0 counts values below 1, bucket k values in [2^(k-1), 2^k) and
+# the last bucket every larger value
+BUCKETS = 24
+
+BUCKET_NAMES = ['lt-1'] + ['lt-%d' % 2 ** k for k in range(1, BUCKETS - 1)] + \
+               ['ge-%d' % 2 ** (BUCKETS - 2)]
+
+def column(rows, index):
+    """
+    Load a column of query result rows into a numeric array, of zeros
+    when the column is missing from the result.
+    """
+    if index is None:
+        values = [0] * len(rows)
+    else:
+        values = [row[index] or 0 for row in rows]
+    if numpy is not None:
+        return numpy.asarray(values, dtype=float)
+    return [float(value) for value in values]
+
+
+def _rank(count, percentile):
+    return max(int(math.ceil(percentile / 100.0 * count)) - 1, 0)
+
+
+def summarize(values):
+    """
+    Return (name, value) pairs for the count, sum, min, max, nearest rank
+    percentiles and log2 bucket histogram of the values.
+    """
+    count = len(values)
+    if numpy is not None:
+        ordered = numpy.sort(values)
+        total = float(ordered.sum())
+        exponents = numpy.frexp(numpy.floor(numpy.maximum(ordered, 0)))[1]
+        histogram = numpy.bincount(numpy.minimum(exponents, BUCKETS - 1),
+                                   minlength=BUCKETS).tolist()
+    else:
+        ordered = sorted(values)
+        total = sum(ordered)
+        histogram = [0] * BUCKETS
+        for value in ordered:
+            bucket = int(max(value, 0)).bit_length()
+            histogram[min(bucket, BUCKETS - 1)] += 1
+
+    summary = [('count', count), ('sum', total)]
+    if count:
+        summary.append(('min', float(ordered[0])))
+        summary.append(('max', float(ordered[-1])))
+        for percentile, name in PERCENTILES:
+            summary.append((name, float(ordered[_rank(count, percentile)])))
+    summary.extend(zip(BUCKET_NAMES, histogram))
+    return summary
+
+
+class RateTracker(object):
+    """
+    Per second rates of entity counters between consecutive reads, with
+    each entity identified by a unique key. Entities without a previous
+    sample and counters that went backwards are left out.
+    """
+
+    def __init__(self):
+        self.previous = {}
+        self.time = None
+
+    def rates(self, now, keys, counts):
+        previous, elapsed = self.previous, None
+        if self.time is not None and now > self.time:
+            elapsed = now - self.time
+        self.previous = dict(zip(keys, counts))
+        self.time = now
+        if elapsed is None:
+            return column([], None)
+
+        if numpy is not None:
+            before = numpy.asarray([previous.get(key, numpy.nan)
+                                    for key in keys], dtype=float)
+            deltas = counts - before
+            return deltas[deltas >= 0] / elapsed
+        rates = list()
+        for key, count in zip(keys, counts):
+            before = previous.get(key)
+            if before is not None and count >= before:
+                rates.append((count - before) / elapsed)
+        return rates
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+Stand-ins for the collectd module, only available inside collectd, and for
+Qpid Proton when it is not installed, so that the plugin can be imported and
+driven by the tests.
+"""
+
+import sys
+import types
+
+DISPATCHED = []
+LOG = []
+
+
+def _collectd():
+    module = types.ModuleType('collectd')
+
+    class Values(object):
+
+        def dispatch(self):
+            DISPATCHED.append((self.host, self.plugin,
+                               getattr(self, 'plugin_instance', None),
+                               self.type,
+                               getattr(self, 'type_instance', None),
+                               self.values[0]))
+
+    def logger(level):
+        def log(message, *args):
+            LOG.append((level, message % args if args else message))
+        return log
+
+    module.Values = Values
+    for level in ('debug', 'info', 'notice', 'warning', 'error'):
+        setattr(module, level, logger(level))
+    for name in ('register_config', 'register_read', 'register_shutdown'):
+        setattr(module, name, lambda *args, **kwargs: None)
+    return module
+
+
+def _proton():
+    module = types.ModuleType('proton')
+    utils = types.ModuleType('proton.utils')
+
+    class ProtonException(Exception):
+        pass
+
+    class ConnectionException(ProtonException):
+        pass
+
+    class Timeout(ProtonException):
+        pass
+
+    class Message(object):
+
+        def __init__(self, body=None, properties=None):
+            self.body = body
+            self.properties = properties
+
+    class Url(object):
+
+        def __init__(self, url):
+            self.url = str(url)
+            self.path = None
+
+        def __str__(self):
+            return self.url
+
+    class SSLDomain(object):
+        MODE_CLIENT, VERIFY_PEER, VERIFY_PEER_NAME, ANONYMOUS_PEER = range(4)
+
+        def __init__(self, mode):
+            self.mode = mode
+
+        def set_trusted_ca_db(self, certificate_db):
+            pass
+
+        def set_peer_authentication(self, verify_mode, trusted_CAs=None):
+            pass
+
+        def set_credentials(self, cert_file, key_file, password):
+            pass
+
+    class BlockingConnection(object):
+
+        def __init__(self, url, **kwargs):
+            raise ConnectionException('cannot connect to %s' % url)
+
+    class SyncRequestResponse(object):
+
+        def __init__(self, connection, address=None):
+            self.connection = connection
+
+    for cls in (ProtonException, ConnectionException, Timeout, Message, Url,
+                SSLDomain):
+        setattr(module, cls.__name__, cls)
+    utils.BlockingConnection = BlockingConnection
+    utils.SyncRequestResponse = SyncRequestResponse
+    module.utils = utils
+    return module
+
+
+def install():
+    """
+    Install the stand-ins of the modules that cannot be imported.
+    """
+    try:
+        import collectd
+    except ImportError:
+        sys.modules['collectd'] = _collectd()
+    try:
+        import proton.utils
+    except ImportError:
+        proton = sys.modules['proton'] = _proton()
+        sys.modules['proton.utils'] = proton.utils
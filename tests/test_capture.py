@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `collectd_qdrouterd.capture`."""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests import stubs
+stubs.install()
+
+import proton
+from collectd_qdrouterd.capture import Recorder, ReplayTransport
+
+
+def request(entity_type, names=None):
+    message = proton.Message(body={u'attributeNames': names or []})
+    message.properties = {u'operation': u'QUERY', u'entityType': entity_type}
+    return message
+
+
+def response(*rows):
+    return proton.Message(body={u'attributeNames': [u'linkName'],
+                                u'results': [[row] for row in rows]})
+
+
+class TestCapture(unittest.TestCase):
+    """Tests for `Recorder` and `ReplayTransport`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'capture.json.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, *calls):
+        recorder = Recorder(self.path)
+        for req, resp in calls:
+            recorder.record(req, resp, 0.5)
+        recorder.close()
+
+    def test_000_round_trip(self):
+        link = u'org.apache.qpid.dispatch.router.link'
+        self.record((request(link, [u'linkName']), response(u'l0', u'l1')))
+        replay = ReplayTransport(self.path, speed=0)
+        self.assertEqual(replay.call(request(link, [u'linkName'])).body,
+                         {u'attributeNames': [u'linkName'],
+                          u'results': [[u'l0'], [u'l1']]})
+
+    def test_001_responses_in_turn(self):
+        link = u'org.apache.qpid.dispatch.router.link'
+        self.record((request(link), response(u'l0')),
+                    (request(link), response(u'l1')))
+        replay = ReplayTransport(self.path, speed=0)
+        rows = [replay.call(request(link)).body[u'results'] for n in range(3)]
+        self.assertEqual(rows, [[[u'l0']], [[u'l1']], [[u'l0']]])
+
+    def test_002_matches_entity_type(self):
+        link = u'org.apache.qpid.dispatch.router.link'
+        self.record((request(link, [u'linkName']), response(u'l0')))
+        replay = ReplayTransport(self.path, speed=0)
+        self.assertEqual(replay.call(request(link, [u'other'])).body[u'results'],
+                         [[u'l0']])
+        self.assertRaises(KeyError, replay.call,
+                          request(u'org.apache.qpid.dispatch.router.address'))
+
+    def test_003_appends(self):
+        link = u'org.apache.qpid.dispatch.router.link'
+        self.record((request(link), response(u'l0')))
+        self.record((request(link), response(u'l1')))
+        replay = ReplayTransport(self.path, speed=0)
+        self.assertEqual(len(replay.responses[(u'QUERY', link)]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `collectd_qdrouterd.cardinality`."""
+
+
+import unittest
+
+from collectd_qdrouterd.cardinality import CardinalityGuard
+
+
+def cycle(guard, category, names):
+    """Run a read cycle and return the names admitted."""
+    guard.start_cycle()
+    return [name for name in names if guard.admit(category, name)]
+
+
+class TestCardinalityGuard(unittest.TestCase):
+    """Tests for `CardinalityGuard`."""
+
+    def test_000_no_limit_admits_without_tracking(self):
+        guard = CardinalityGuard()
+        for n in range(100):
+            names = ['tmp-%d-%d' % (n, i) for i in range(50)]
+            self.assertEqual(cycle(guard, 'link', names), names)
+        self.assertFalse(guard.enabled('link'))
+        self.assertEqual(guard.admitted, {})
+
+    def test_001_unlimited_category_not_tracked(self):
+        guard = CardinalityGuard({'link': 2})
+        self.assertEqual(cycle(guard, 'address', ['a', 'b', 'c']),
+                         ['a', 'b', 'c'])
+        self.assertNotIn('address', guard.admitted)
+
+    def test_002_category_limit_drops(self):
+        guard = CardinalityGuard({'link': 3})
+        self.assertEqual(cycle(guard, 'link', 'abcde'), list('abc'))
+        self.assertEqual(guard.dropped, {'link': 2})
+
+    def test_003_busy_entities_keep_series(self):
+        guard = CardinalityGuard({'link': 3})
+        cycle(guard, 'link', 'abc')
+        # New entities listed first do not displace entities seen last cycle
+        self.assertEqual(cycle(guard, 'link', 'dabc'), list('abc'))
+
+    def test_004_idle_entities_evicted(self):
+        guard = CardinalityGuard({'link': 3})
+        cycle(guard, 'link', 'abc')
+        # a and b missed one cycle only, they are not evicted yet
+        self.assertEqual(cycle(guard, 'link', 'cd'), ['c'])
+        self.assertEqual(cycle(guard, 'link', 'cdef'), list('cde'))
+        self.assertEqual(guard.dropped, {'link': 1})
+
+    def test_005_total_limit(self):
+        guard = CardinalityGuard(total=3)
+        guard.start_cycle()
+        self.assertTrue(guard.admit('link', 'a'))
+        self.assertTrue(guard.admit('address', 'b'))
+        self.assertTrue(guard.admit('address', 'c'))
+        self.assertFalse(guard.admit('link', 'd'))
+        self.assertEqual(guard.dropped, {'link': 1})
+
+    def test_006_total_limit_evicts_other_category(self):
+        guard = CardinalityGuard(total=2)
+        cycle(guard, 'address', 'ab')
+        guard.start_cycle()
+        guard.start_cycle()
+        self.assertTrue(guard.admit('link', 'x'))
+        self.assertEqual(len(guard.admitted['address']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
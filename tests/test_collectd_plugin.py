@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `collectd_qdrouterd.collectd_plugin` against a fake router."""
+
+
+import unittest
+
+from tests import stubs
+stubs.install()
+
+import proton
+from collectd_qdrouterd import collectd_plugin, config_file
+from collectd_qdrouterd.collectd_plugin import CollectdPlugin
+
+LINK = 'org.apache.qpid.dispatch.router.link'
+AUTO_LINK = 'org.apache.qpid.dispatch.router.config.autoLink'
+ROUTER = 'org.apache.qpid.dispatch.router'
+
+
+class FakeRouter(object):
+    """
+    Answers management queries from tables of entities, projecting the
+    attributes requested, and keeps the queries it was sent.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = list()
+        self.url = proton.Url('amqp://fake')
+        self.connection = self
+        self.closed = False
+        self.fail = False
+
+    def call(self, request):
+        if self.fail:
+            raise proton.ConnectionException('connection closed')
+        entity_type = request.properties['entityType']
+        names = request.body['attributeNames']
+        self.queries.append((entity_type, tuple(names)))
+        rows = self.tables.get(entity_type, [])
+        if not names:
+            names = sorted(set(name for row in rows for name in row))
+        return proton.Message(body={'attributeNames': list(names),
+                                    'results': [[row.get(name) for name in names]
+                                                for row in rows]})
+
+    def close(self):
+        self.closed = True
+
+
+def link(name, identity, connection, undelivered=0, unsettled=0, delivered=0):
+    return {'linkName': name, 'identity': identity, 'connectionId': connection,
+            'undeliveredCount': undelivered, 'unsettledCount': unsettled,
+            'deliveryCount': delivered, 'acceptedCount': delivered}
+
+
+class TestCollectdPlugin(unittest.TestCase):
+    """Tests for `CollectdPlugin` reads."""
+
+    def setUp(self):
+        self.routers = list()
+        self.refused = set()
+        self.tables = {}
+        self.connection = collectd_plugin.QdrouterdClient.connection
+        collectd_plugin.QdrouterdClient.connection = staticmethod(self.connect)
+
+    def tearDown(self):
+        collectd_plugin.QdrouterdClient.connection = self.connection
+
+    def connect(self, url, **kwargs):
+        if url in self.refused:
+            raise proton.ConnectionException('connection refused')
+        router = FakeRouter(self.tables)
+        self.routers.append(router)
+        return router
+
+    def config(self, *lines):
+        root = config_file.parse(('<Router>', 'Host "h"') + lines + ('</Router>',))
+        return collectd_plugin.parse_config(root.children[0])
+
+    def read(self, *lines):
+        plugin = CollectdPlugin(self.config(*lines))
+        self.dispatched = {}
+        plugin.dispatch_values = self.dispatch
+        plugin.read()
+        return plugin
+
+    def dispatch(self, value, host, plugin, instance, metric_type, type_instance=None):
+        self.dispatched[(plugin, instance, metric_type)] = value
+
+    def test_000_one_link_query(self):
+        self.tables[LINK] = [link('l0', '1', 7, 1, 2, 3)]
+        self.read('Links true', 'Connections true', 'AutoLinks true')
+        queries = [query for query in self.routers[0].queries if query[0] == LINK]
+        self.assertEqual(len(queries), 1)
+        names = queries[0][1]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(set(names),
+                         set(('linkName', 'connectionId', 'identity') +
+                             CollectdPlugin.link_stats))
+
+    def test_001_connection_sums(self):
+        self.tables[LINK] = [link('l0', '1', 7, 1, 2, 3),
+                             link('l1', '2', 7, 10, 20, 30),
+                             link('l2', '3', 8, 100, 200, 300),
+                             link('l3', '4', None, 1000, 1000, 1000)]
+        self.read('Links false', 'Connections true')
+        self.assertEqual(self.dispatched,
+                         {('connection', '7', 'link-count'): '2',
+                          ('connection', '7', 'undelivered-count'): '11',
+                          ('connection', '7', 'unsettled-count'): '22',
+                          ('connection', '7', 'delivery-count'): '33',
+                          ('connection', '8', 'link-count'): '1',
+                          ('connection', '8', 'undelivered-count'): '100',
+                          ('connection', '8', 'unsettled-count'): '200',
+                          ('connection', '8', 'delivery-count'): '300'})
+
+    def test_002_dropped_connection_counted_once(self):
+        self.tables[LINK] = [link('l%d' % n, str(n), n % 3, delivered=1)
+                             for n in range(10)]
+        self.read('Links false', 'Connections true', 'ConnectionLimit 2')
+        self.assertEqual(self.dispatched[('connection', '_overflow', 'dropped-instances')], '1')
+        self.assertEqual(self.dispatched[('connection', '_overflow', 'link-count')], '3')
+
+    def test_003_auto_link_joined_on_link_ref(self):
+        self.tables[LINK] = [link('l0', '1', 7, 1, 2, 3), link('l1', '2', 7, 4, 5, 6)]
+        self.tables[AUTO_LINK] = [{'name': 'orders', 'operStatus': 'active',
+                                   'linkRef': '2'},
+                                  {'addr': 'returns', 'operStatus': 'inactive'}]
+        self.read('Links false', 'AutoLinks true')
+        self.assertEqual(self.dispatched,
+                         {('autolink', 'orders', 'oper-status'): '1',
+                          ('autolink', 'orders', 'undelivered-count'): '4',
+                          ('autolink', 'orders', 'unsettled-count'): '5',
+                          ('autolink', 'orders', 'delivery-count'): '6',
+                          ('autolink', 'returns', 'oper-status'): '0'})
+
+    def test_004_router_stats_projected(self):
+        self.tables[ROUTER] = [{'id': 'r0', 'linkCount': 4, 'addrCount': 9}]
+        self.read('Router true', 'Links false',
+                  '<RouterStats>', 'stat "linkCount"', '</RouterStats>')
+        self.assertEqual(self.routers[0].queries, [(ROUTER, ('id', 'linkCount'))])
+        self.assertEqual(self.dispatched, {('router', 'r0', 'link-count'): '4'})
+
+    def test_005_link_stats_projected(self):
+        self.tables[LINK] = [link('l0', '1', 7, delivered=5)]
+        self.read('<LinkStats>', 'stat "deliveryCount"', '</LinkStats>')
+        self.assertEqual(self.routers[0].queries,
+                         [(LINK, ('linkName', 'deliveryCount'))])
+        self.assertEqual(self.dispatched, {('link', 'l0', 'delivery-count'): '5'})
+
+    def test_006_kept_connection_reconnected(self):
+        self.tables[LINK] = [link('l0', '1', 7, delivered=5)]
+        config = self.config()
+        instances = {}
+        dispatched = list()
+        collectd_plugin.read_router(config, instances, lambda *args: dispatched.append(args))
+        self.routers[0].fail = True
+        del dispatched[:]
+        collectd_plugin.read_router(config, instances, lambda *args: dispatched.append(args))
+        self.assertTrue(self.routers[0].closed)
+        self.assertEqual(len(self.routers), 2)
+        self.assertEqual(len(dispatched), len(CollectdPlugin.link_stats))
+
+    def test_007_failing_router_does_not_stop_others(self):
+        self.tables[LINK] = [link('l0', '1', 7, delivered=5)]
+        self.refused.add('amqp://a:5672')
+        configs = {'a': self.config('Host "a"'), 'b': self.config('Host "b"')}
+        instances = {}
+        del stubs.LOG[:]
+        collectd_plugin.read_configs(configs, instances)
+        self.assertEqual(list(instances), ['b:5672'])
+        errors = [message for level, message in stubs.LOG if level == 'error']
+        self.assertEqual(len(errors), 1)
+        self.assertIn('connection refused', errors[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `collectd_qdrouterd.config_file` and configuration reloads."""
+
+
+import unittest
+
+from tests import stubs
+stubs.install()
+
+from collectd_qdrouterd import collectd_plugin, config_file
+
+
+ROUTERS = '''
+# Routers reloaded by the plugin
+<Router>
+  Name "edge1"
+  Host "edge1.example.com"
+  Port 5672
+  Links true   # trailing comment
+  <LinkInclude>
+    pattern "^orders"
+    pattern "say \\"hi\\""
+  </LinkInclude>
+</Router>
+'''
+
+
+class TestParse(unittest.TestCase):
+    """Tests for `config_file.parse`."""
+
+    def test_000_blocks(self):
+        root = config_file.parse(ROUTERS.splitlines())
+        self.assertEqual([node.key for node in root.children], ['Router'])
+        router = root.children[0]
+        self.assertEqual([(node.key, node.values) for node in router.children],
+                         [('Name', ['edge1']),
+                          ('Host', ['edge1.example.com']),
+                          ('Port', [5672.0]),
+                          ('Links', [True]),
+                          ('LinkInclude', [])])
+        self.assertEqual(router.children[-1].children[1].values, ['say "hi"'])
+
+    def test_001_block_values(self):
+        root = config_file.parse(['<Module "collectd_qdrouterd">', '</Module>'])
+        self.assertEqual(root.children[0].values, ['collectd_qdrouterd'])
+
+    def test_002_unbalanced(self):
+        self.assertRaises(ValueError, config_file.parse, ['<Router>'])
+        self.assertRaises(ValueError, config_file.parse, ['</Router>'])
+        self.assertRaises(ValueError, config_file.parse,
+                          ['<Router>', '</LinkInclude>'])
+
+
+class Instance(object):
+
+    def __init__(self):
+        self.closed = False
+        self.config = None
+
+    def reconfigure(self, config):
+        self.config = config
+
+    def close(self):
+        self.closed = True
+
+
+class TestApplyConfig(unittest.TestCase):
+    """Tests for `collectd_plugin.apply_config`."""
+
+    def setUp(self):
+        self.configs = {}
+        self.instances = {}
+
+    def apply(self, *lines):
+        router = config_file.parse(lines).children[0]
+        config = collectd_plugin.parse_config(router, 'routers.conf')
+        return collectd_plugin.apply_config(config, self.configs, self.instances)
+
+    def connect(self, config):
+        instance = self.instances[config.identity] = Instance()
+        return instance
+
+    def test_000_unchanged_router_left_alone(self):
+        config = self.apply('<Router>', 'Host "a"', '</Router>')
+        instance = self.connect(config)
+        self.assertIs(self.apply('<Router>', 'Host "a"', '</Router>'), config)
+        self.assertIs(self.instances[config.identity], instance)
+        self.assertFalse(instance.closed)
+
+    def test_001_changed_router_keeps_connection(self):
+        config = self.apply('<Router>', 'Host "a"', 'LinkLimit 10', '</Router>')
+        instance = self.connect(config)
+        guard, memory = config.guard, config.memory
+        changed = self.apply('<Router>', 'Host "a"', 'LinkLimit 10',
+                             'Addresses true', '</Router>')
+        self.assertIsNot(changed, config)
+        self.assertIs(self.instances[config.identity], instance)
+        self.assertIs(instance.config, changed)
+        self.assertIs(changed.guard, guard)
+        self.assertIs(changed.memory, memory)
+
+    def test_002_new_limit_resets_guard(self):
+        config = self.apply('<Router>', 'Host "a"', 'LinkLimit 10', '</Router>')
+        changed = self.apply('<Router>', 'Host "a"', 'LinkLimit 20', '</Router>')
+        self.assertIsNot(changed.guard, config.guard)
+
+    def test_003_connection_change_reconnects(self):
+        config = self.apply('<Router>', 'Name "a"', 'Host "a"', '</Router>')
+        instance = self.connect(config)
+        self.apply('<Router>', 'Name "a"', 'Host "a"', 'Port "5673"', '</Router>')
+        self.assertTrue(instance.closed)
+        self.assertNotIn(config.identity, self.instances)
+
+    def test_004_remove(self):
+        config = self.apply('<Router>', 'Host "a"', '</Router>')
+        instance = self.connect(config)
+        collectd_plugin.remove_config(config.identity, self.configs, self.instances)
+        self.assertTrue(instance.closed)
+        self.assertEqual(self.configs, {})
+
+    def test_005_plugin_options_ignored(self):
+        workers = collectd_plugin.WORKERS
+        config = self.apply('<Router>', 'Host "a"', 'Workers 8', '</Router>')
+        self.assertEqual(collectd_plugin.WORKERS, workers)
+        self.assertEqual(config.host, 'a')
+
+    def test_006_unquoted_port(self):
+        config = self.apply('<Router>', 'Host "a"', 'Port 5673', '</Router>')
+        self.assertEqual(config.identity, 'a:5673')
+        self.assertEqual(config.url(), 'amqp://a:5673')
+
+    def test_007_memory_options_validated(self):
+        del stubs.LOG[:]
+        config = self.apply('<Router>', 'Host "a"', 'MemoryWindow 0',
+                            'MemoryTop -1', '</Router>')
+        self.assertEqual((config.memory.window, config.memory.top), (10, 5))
+        self.assertEqual([level for level, message in stubs.LOG],
+                         ['error', 'error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
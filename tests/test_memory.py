@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `collectd_qdrouterd.memory`."""
+
+
+import unittest
+
+from collectd_qdrouterd.memory import MemoryTracker
+
+
+class TestMemoryTracker(unittest.TestCase):
+    """Tests for `MemoryTracker`."""
+
+    def feed(self, tracker, series):
+        """Feed one sample per 10 seconds of each type's values."""
+        for n in range(len(list(series.values())[0])):
+            tracker.update(n * 10.0,
+                           dict((name, values[n]) for name, values in series.items()))
+
+    def test_000_held_bytes(self):
+        self.assertEqual(MemoryTracker.held_bytes(64, 10), 640)
+        self.assertEqual(MemoryTracker.held_bytes(64, 10, 4), 384)
+
+    def test_001_slope(self):
+        samples = [(0.0, 100), (10.0, 200), (20.0, 300)]
+        self.assertAlmostEqual(MemoryTracker.slope(samples), 10.0)
+        self.assertEqual(MemoryTracker.slope(samples[:1]), 0.0)
+
+    def test_002_leak_suspect(self):
+        tracker = MemoryTracker(window=3, top=5)
+        self.feed(tracker, {'grows': [100, 200, 300],
+                            'flat': [500, 500, 500],
+                            'wobbles': [100, 300, 200]})
+        total, growth, suspects, types = tracker.analyze()
+        self.assertEqual(total, 1000)
+        self.assertEqual(suspects, 1)
+        self.assertEqual(types[0][0], 'grows')
+        self.assertTrue(types[0][3])
+        self.assertNotIn('flat', [entry[0] for entry in types])
+
+    def test_003_not_suspect_before_window_full(self):
+        tracker = MemoryTracker(window=5)
+        self.feed(tracker, {'grows': [100, 200, 300]})
+        self.assertEqual(tracker.analyze()[2], 0)
+
+    def test_004_window_slides(self):
+        tracker = MemoryTracker(window=3)
+        self.feed(tracker, {'type': [900, 100, 200, 300]})
+        self.assertEqual(len(tracker.samples['type']), 3)
+        self.assertEqual(tracker.analyze()[2], 1)
+
+    def test_005_top(self):
+        tracker = MemoryTracker(window=2, top=2)
+        self.feed(tracker, {'a': [0, 10], 'b': [0, 30], 'c': [0, 20]})
+        self.assertEqual([entry[0] for entry in tracker.analyze()[3]],
+                         ['b', 'c'])
+
+    def test_006_forgets_missing_types(self):
+        tracker = MemoryTracker()
+        tracker.update(0.0, {'a': 1, 'b': 2})
+        tracker.update(10.0, {'a': 1})
+        self.assertEqual(list(tracker.samples), ['a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `collectd_qdrouterd.shard`."""
+
+
+import unittest
+
+from collectd_qdrouterd.shard import LogBuffer, SampleBatch, SampleTable
+
+
+class TestSampleBatch(unittest.TestCase):
+    """Tests for `SampleBatch` and `SampleTable`."""
+
+    def test_000_round_trip(self):
+        batch = SampleBatch()
+        table = SampleTable()
+        batch.add(1, 'h', 'link', 'l0', 'delivery-count')
+        batch.add('2.5', 'h', 'link', 'l0', 'undelivered-count', 'x')
+        self.assertEqual(list(table.unpack(batch.pack())),
+                         [(('h', 'link', 'l0', 'delivery-count', None), 1.0),
+                          (('h', 'link', 'l0', 'undelivered-count', 'x'), 2.5)])
+
+    def test_001_keys_sent_once(self):
+        batch = SampleBatch()
+        table = SampleTable()
+        for value in (1, 2):
+            batch.add(value, 'h', 'link', 'l0', 'delivery-count')
+            packed = batch.pack()
+            self.assertEqual(list(table.unpack(packed)),
+                             [(('h', 'link', 'l0', 'delivery-count', None), value)])
+        self.assertEqual(packed[1], [])
+
+    def test_002_skips_non_numeric(self):
+        batch = SampleBatch()
+        batch.add(None, 'h', 'link', 'l0', 'delivery-count')
+        batch.add('n/a', 'h', 'link', 'l0', 'delivery-count')
+        self.assertEqual(list(SampleTable().unpack(batch.pack())), [])
+
+    def test_003_tables_reset_on_churn(self):
+        batch = SampleBatch(spare=4)
+        table = SampleTable()
+        for cycle in range(100):
+            names = ['l%d-%d' % (cycle, n) for n in range(3)]
+            for name in names:
+                batch.add(1, 'h', 'link', name, 'delivery-count')
+            samples = list(table.unpack(batch.pack()))
+            self.assertEqual([key[2] for key, value in samples], names)
+        self.assertLessEqual(len(batch.keys), 2 * 3 + 4 + 3)
+        self.assertLessEqual(len(table.keys), 2 * 3 + 4 + 3)
+
+    def test_004_tables_kept_for_live_keys(self):
+        batch = SampleBatch(spare=0)
+        for cycle in range(3):
+            batch.add(1, 'h', 'link', 'l0', 'delivery-count')
+            packed = batch.pack()
+        self.assertFalse(packed[0])
+        self.assertEqual(len(batch.keys), 1)
+
+
+class TestLogBuffer(unittest.TestCase):
+    """Tests for `LogBuffer`."""
+
+    def test_000_drain(self):
+        log = LogBuffer(None)
+        log.info('reading %s', 'a')
+        log.error('100% failed')
+        self.assertEqual(log.drain(), [('info', 'reading a'),
+                                       ('error', '100% failed')])
+        self.assertEqual(log.drain(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `collectd_qdrouterd.summary`."""
+
+
+import unittest
+
+from collectd_qdrouterd.summary import (BUCKET_NAMES, RateTracker, column,
+                                        summarize)
+
+
+def rows(*values):
+    """Query result rows of a name and a count column."""
+    return [['e%d' % n, value] for n, value in enumerate(values)]
+
+
+class TestSummarize(unittest.TestCase):
+    """Tests for `column` and `summarize`."""
+
+    def test_000_column(self):
+        self.assertEqual(list(column(rows(3, None, 0), 1)), [3.0, 0.0, 0.0])
+        self.assertEqual(list(column(rows(3, 4), None)), [0.0, 0.0])
+
+    def test_001_summary(self):
+        summary = dict(summarize(column(rows(*range(1, 101)), 1)))
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['sum'], 5050.0)
+        self.assertEqual(summary['min'], 1.0)
+        self.assertEqual(summary['max'], 100.0)
+        self.assertEqual(summary['p50'], 50.0)
+        self.assertEqual(summary['p90'], 90.0)
+        self.assertEqual(summary['p99'], 99.0)
+
+    def test_002_buckets(self):
+        summary = dict(summarize(column(rows(0, 0.5, 1, 3, 4, 2 ** 40), 1)))
+        self.assertEqual(summary['lt-1'], 2)
+        self.assertEqual(summary['lt-2'], 1)
+        self.assertEqual(summary['lt-4'], 1)
+        self.assertEqual(summary['lt-8'], 1)
+        self.assertEqual(summary[BUCKET_NAMES[-1]], 1)
+        self.assertEqual(sum(summary[name] for name in BUCKET_NAMES), 6)
+
+    def test_003_empty(self):
+        summary = summarize(column([], 1))
+        self.assertEqual(summary[:2], [('count', 0), ('sum', 0.0)])
+        self.assertNotIn('p50', dict(summary))
+        self.assertEqual(len(summary), 2 + len(BUCKET_NAMES))
+
+
+class TestRateTracker(unittest.TestCase):
+    """Tests for `RateTracker`."""
+
+    def rates(self, tracker, now, counts):
+        return sorted(tracker.rates(now, [key for key, count in counts],
+                                    column(counts, 1)))
+
+    def test_000_first_read_has_no_rates(self):
+        self.assertEqual(self.rates(RateTracker(), 0.0, [('a', 10)]), [])
+
+    def test_001_rates(self):
+        tracker = RateTracker()
+        self.rates(tracker, 0.0, [('a', 10), ('b', 100)])
+        self.assertEqual(self.rates(tracker, 10.0, [('a', 30), ('b', 100)]),
+                         [0.0, 2.0])
+
+    def test_002_new_and_reset_counters_left_out(self):
+        tracker = RateTracker()
+        self.rates(tracker, 0.0, [('a', 10), ('b', 100)])
+        self.assertEqual(self.rates(tracker, 10.0, [('a', 5), ('b', 110), ('c', 1)]),
+                         [1.0])
+
+    def test_003_entities_sharing_a_name(self):
+        # Two links with the same name, told apart by their identity
+        tracker = RateTracker()
+        self.rates(tracker, 0.0, [('1', 0), ('2', 1000)])
+        self.assertEqual(self.rates(tracker, 10.0, [('1', 10), ('2', 1100)]),
+                         [1.0, 10.0])
+
+
+if __name__ == '__main__':
+    unittest.main()